@@ -2,7 +2,10 @@
 import random
 import os
 import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
+import numpy as np
 import math
 
 # Word lists by length
@@ -50,21 +53,44 @@ DIFFICULTY_PRESETS = {
 ALLOWED_ROTATIONS = [0, 90, 180, 270]
 IMAGE_SIZE = (800, 600)
 DEFAULT_SAFE_MARGIN = 20
-MAX_PLACEMENT_ATTEMPTS = 100
+MAX_PLACEMENT_ATTEMPTS = 10  # Random starting points per word, each followed by a spiral walk
+MAX_SPIRAL_STEPS = 32
+SPIRAL_STEP_SIZE = 40
+WORD_SPACING = 20  # Collision margin kept around each word
+DENSE_LAYOUT_THRESHOLD = 0.2  # Placed area / image area beyond which spacing is halved
+SPATIAL_HASH_CELL_SIZE = 200  # Roughly the size of a rendered word
+
+# Exact (cos, sin) for quarter turns, so the common rotations need no trig
+QUARTER_TURN_COS_SIN = {0: (1, 0), 90: (0, 1), 180: (-1, 0), 270: (0, -1)}
+
+# Quarter-turn image rotations are plain pixel transposes, with no resampling
+QUARTER_TURN_TRANSPOSES = {
+    90: Image.Transpose.ROTATE_90,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_270,
+}
 
 
 def scramble_word(word):
-    """Generate an incorrect version of the word by randomly reordering characters"""
+    """Generate an incorrect version of the word by randomly reordering characters.
+
+    Raises ValueError for words made of a single repeated letter, which
+    cannot be scrambled.
+    """
+    if len(set(word)) < 2:
+        raise ValueError(f"Cannot scramble '{word}': it needs at least two different letters")
     chars = list(word)
-    while True:
-        random.shuffle(chars)
-        scrambled = ''.join(chars)
-        if scrambled != word:
-            return scrambled
+    random.shuffle(chars)
+    if ''.join(chars) == word:
+        # Swap the first letter with any different letter instead of reshuffling
+        swap_index = next(i for i in range(1, len(chars)) if chars[i] != chars[0])
+        chars[0], chars[swap_index] = chars[swap_index], chars[0]
+    return ''.join(chars)
 
 
+@functools.lru_cache(maxsize=None)
 def load_font(font_size):
-    """Attempt to load font with fallbacks"""
+    """Attempt to load font with fallbacks (cached per size)"""
     try:
         return ImageFont.truetype("Arial Bold", font_size)
     except IOError:
@@ -94,9 +120,12 @@ def calculate_corners(center_x, center_y, width, height, angle=0):
         # No rotation, just add offsets to center
         return [(center_x + dx, center_y + dy) for dx, dy in corners]
     
-    # Convert angle to radians for rotation calculation
-    angle_rad = math.radians(angle)
-    cos_a, sin_a = math.cos(angle_rad), math.sin(angle_rad)
+    if angle % 360 in QUARTER_TURN_COS_SIN:
+        cos_a, sin_a = QUARTER_TURN_COS_SIN[angle % 360]
+    else:
+        # Convert angle to radians for rotation calculation
+        angle_rad = math.radians(angle)
+        cos_a, sin_a = math.cos(angle_rad), math.sin(angle_rad)
     
     # Rotate each corner and add to center position
     return [(center_x + dx * cos_a - dy * sin_a, center_y + dx * sin_a + dy * cos_a) 
@@ -146,7 +175,11 @@ def get_polygon_axes(corners):
 
 
 def check_polygons_overlap(corners1, corners2, margin=0):
-    """Check if two polygons overlap using Separating Axis Theorem (SAT)"""
+    """Check if two polygons overlap using Separating Axis Theorem (SAT).
+
+    Only needed for arbitrarily rotated polygons; word placement uses the
+    exact and much cheaper axis-aligned test below.
+    """
     # Get all axes to check
     axes = get_polygon_axes(corners1) + get_polygon_axes(corners2)
     
@@ -168,100 +201,182 @@ def check_polygons_overlap(corners1, corners2, margin=0):
     return True
 
 
+def get_aabb(center_x, center_y, width, height):
+    """Get the axis-aligned bounding box (xmin, ymin, xmax, ymax) of a rectangle"""
+    half_width, half_height = width / 2, height / 2
+    return (center_x - half_width, center_y - half_height,
+            center_x + half_width, center_y + half_height)
+
+
+def check_aabbs_overlap(aabb1, aabb2, margin=0):
+    """Check if two axis-aligned boxes overlap, expanding each by margin"""
+    return not (aabb1[2] + margin < aabb2[0] - margin or
+                aabb2[2] + margin < aabb1[0] - margin or
+                aabb1[3] + margin < aabb2[1] - margin or
+                aabb2[3] + margin < aabb1[1] - margin)
+
+
+def get_spatial_hash_cells(aabb, cell_size=SPATIAL_HASH_CELL_SIZE):
+    """Yield the (cell_x, cell_y) grid cells an axis-aligned box touches"""
+    xmin, ymin, xmax, ymax = aabb
+    for cell_x in range(int(xmin // cell_size), int(xmax // cell_size) + 1):
+        for cell_y in range(int(ymin // cell_size), int(ymax // cell_size) + 1):
+            yield cell_x, cell_y
+
+
+def add_to_spatial_hash(spatial_hash, aabb, index):
+    """Register a placed box index in every grid cell it touches"""
+    for cell in get_spatial_hash_cells(aabb):
+        spatial_hash.setdefault(cell, []).append(index)
+
+
+def spiral_offsets(step, max_steps):
+    """Yield (dx, dy) offsets walking an outward square spiral: R, U, LL, DD, RRR, UUU, ..."""
+    dx = dy = 0
+    direction_x, direction_y = 1, 0
+    run_length = 1
+    steps = 0
+    while True:
+        # Each run length is walked twice (e.g. right then up) before growing
+        for _ in range(2):
+            for _ in range(run_length):
+                if steps >= max_steps:
+                    return
+                dx += direction_x * step
+                dy += direction_y * step
+                steps += 1
+                yield dx, dy
+            # Turn a quarter counterclockwise (y grows downwards in images)
+            direction_x, direction_y = direction_y, -direction_x
+        run_length += 1
+
+
+@functools.lru_cache(maxsize=256)
 def render_text_image(text, font, angle):
-    """Render text to an image and rotate if needed"""
-    # Create a temporary image with generous padding
-    padding = 50
-    temp_size = 1000  # Large enough for most text
-    temp_img = Image.new('RGBA', (temp_size, temp_size), (255, 255, 255, 0))
-    temp_draw = ImageDraw.Draw(temp_img)
-    
-    # Draw the text at the center
-    center_pos = temp_size // 2
+    """Render text to a grayscale 'L' coverage mask and rotate if needed.
+
+    The mask is pasted through with the text color, which needs a quarter of
+    the memory of an RGBA image. Results are cached per (text, font, angle);
+    the returned mask is shared, so callers must treat it as read-only.
+    """
+    # Get the text bounding box analytically instead of scanning rendered pixels
     try:
-        temp_draw.text((center_pos, center_pos), text, fill=(0, 0, 0), 
-                      font=font, anchor="mm", stroke_width=3, stroke_fill=(0, 0, 0))
+        text_bbox = font.getbbox(text, stroke_width=3)
+        stroke_width = 3
     except TypeError:
         # Fallback for older Pillow versions
-        bbox = temp_draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        temp_draw.text((center_pos - text_width//2, center_pos - text_height//2), 
-                      text, fill=(0, 0, 0), font=font, stroke_width=3, stroke_fill=(0, 0, 0))
-    
-    # Get the actual text bounding box
-    text_bbox = temp_img.getbbox()
-    if not text_bbox:
+        text_bbox = font.getbbox(text)
+        stroke_width = 0
+    if text_bbox[2] <= text_bbox[0] or text_bbox[3] <= text_bbox[1]:
         return None, 0, 0  # Return None if no visible text
     
-    # Crop to the actual text with small padding
+    text_width = text_bbox[2] - text_bbox[0]
+    text_height = text_bbox[3] - text_bbox[1]
+    
+    # Draw the text into an image sized to the text with small padding
     padding = 10
-    trimmed_img = temp_img.crop((
-        text_bbox[0] - padding,
-        text_bbox[1] - padding,
-        text_bbox[2] + padding,
-        text_bbox[3] + padding
-    ))
+    trimmed_img = Image.new('L', (text_width + 2 * padding, text_height + 2 * padding), 0)
+    trimmed_draw = ImageDraw.Draw(trimmed_img)
+    trimmed_draw.text((padding - text_bbox[0], padding - text_bbox[1]), text, fill=255,
+                      font=font, stroke_width=stroke_width, stroke_fill=255)
     
     # Rotate if needed
-    if angle != 0:
+    if angle % 360 in QUARTER_TURN_TRANSPOSES:
+        trimmed_img = trimmed_img.transpose(QUARTER_TURN_TRANSPOSES[angle % 360])
+    elif angle % 360 != 0:
         trimmed_img = trimmed_img.rotate(angle, expand=True, resample=Image.BICUBIC)
     
-    # Get final dimensions
-    final_bbox = trimmed_img.getbbox()
-    if not final_bbox:
-        return None, 0, 0
-    
-    width = final_bbox[2] - final_bbox[0]
-    height = final_bbox[3] - final_bbox[1]
+    # Get final dimensions by rotating the text box corners (quarter turns just
+    # swap width and height) instead of scanning the rotated pixels
+    corners = calculate_corners(0, 0, text_width, text_height, angle)
+    xs = [x for x, _ in corners]
+    ys = [y for _, y in corners]
+    width = math.ceil(max(xs) - min(xs))
+    height = math.ceil(max(ys) - min(ys))
     
     return trimmed_img, width + 20, height + 20  # Add padding for collision detection
 
 
-def try_place_word(image_size, placed_words, width, height, angle, safe_margin):
-    """Try to place a word without overlapping existing words"""
-    min_x = width // 2 + safe_margin
-    max_x = image_size[0] - width // 2 - safe_margin
-    min_y = height // 2 + safe_margin
-    max_y = image_size[1] - height // 2 - safe_margin
+def check_placed_overlap(aabb, placed_aabbs, spatial_hash, margin):
+    """Check if a box overlaps any placed box registered in nearby spatial hash cells"""
+    search_aabb = (aabb[0] - 2 * margin, aabb[1] - 2 * margin,
+                   aabb[2] + 2 * margin, aabb[3] + 2 * margin)
+    checked = set()
+    for cell in get_spatial_hash_cells(search_aabb):
+        for index in spatial_hash.get(cell, ()):
+            if index in checked:
+                continue
+            checked.add(index)
+            if check_aabbs_overlap(aabb, placed_aabbs[index], margin):
+                return True
+    return False
+
+
+def try_place_word(image_size, placed_aabbs, spatial_hash, width, height, safe_margin,
+                   rng, spacing=WORD_SPACING):
+    """Try to place a word without overlapping existing words.
+
+    Draws MAX_PLACEMENT_ATTEMPTS random starting positions from the NumPy
+    generator in one batch; from each start that collides it walks an
+    outward spiral of nearby positions. Rendered word images are already rotated, so
+    each word occupies an axis-aligned box and the spatial hash narrows the
+    overlap checks down to the words in neighbouring cells.
+    Returns (x, y, aabb) or None.
+    """
+    # Center range that keeps the whole box inside the safe margins, so the
+    # sampled position needs no separate corner bounds check
+    min_x = safe_margin + (width + 1) // 2
+    max_x = image_size[0] - safe_margin - width // 2 - 1
+    min_y = safe_margin + (height + 1) // 2
+    max_y = image_size[1] - safe_margin - height // 2 - 1
     
     # If the word is too large for the image with margins, reduce the margins
     if min_x >= max_x:
-        min_x = width // 2
-        max_x = image_size[0] - width // 2
+        min_x = (width + 1) // 2
+        max_x = image_size[0] - width // 2 - 1
         
     if min_y >= max_y:
-        min_y = height // 2
-        max_y = image_size[1] - height // 2
+        min_y = (height + 1) // 2
+        max_y = image_size[1] - height // 2 - 1
     
-    # Get position within safe boundaries
-    x = random.randint(min_x, max_x)
-    y = random.randint(min_y, max_y)
+    # Get starting positions within safe boundaries
+    start_xs = rng.integers(min_x, max_x + 1, MAX_PLACEMENT_ATTEMPTS).tolist()
+    start_ys = rng.integers(min_y, max_y + 1, MAX_PLACEMENT_ATTEMPTS).tolist()
+    candidate_offsets = [(0, 0), *spiral_offsets(SPIRAL_STEP_SIZE, MAX_SPIRAL_STEPS)]
     
-    # Calculate corners for collision detection
-    current_corners = calculate_corners(x, y, width, height, angle)
+    # Check each start and then the spiral around it, clipped to the boundaries
+    for start_x, start_y in zip(start_xs, start_ys):
+        for dx, dy in candidate_offsets:
+            x = min(max(start_x + dx, min_x), max_x)
+            y = min(max(start_y + dy, min_y), max_y)
+            current_aabb = get_aabb(x, y, width, height)
+            if not check_placed_overlap(current_aabb, placed_aabbs, spatial_hash, spacing):
+                # Word placement is valid
+                return x, y, current_aabb
     
-    # First check if all corners are within image boundaries
-    if not check_corners_in_bounds(current_corners, image_size[0], image_size[1], safe_margin):
-        return None
-    
-    # Check if this word overlaps with already placed words
-    margin = 20  # Spacing between words
-    for px, py, pw, ph, pangle in placed_words:
-        placed_corners = calculate_corners(px, py, pw, ph, pangle)
-        if check_polygons_overlap(current_corners, placed_corners, margin):
-            return None
-    
-    # Word placement is valid
-    return x, y
+    return None
+
+def get_puzzle_params(difficulty="medium", custom_params=None):
+    """Get the difficulty preset parameters with any custom overrides applied"""
+    return {**DIFFICULTY_PRESETS[difficulty], **(custom_params or {})}
+
+
+def preload_fonts(font_size_range):
+    """Load every font size in the inclusive range into the load_font cache"""
+    for font_size in range(font_size_range[0], font_size_range[1] + 1):
+        load_font(font_size)
+
 
 def generate_word_puzzle(difficulty="medium", correct_ratio=None, custom_word=None, 
-                         custom_params=None, output_dir="."):
-    """Generate a word puzzle image with randomly placed words"""
+                         custom_params=None, output_dir=".", params=None):
+    """Generate a word puzzle image with randomly placed words.
+
+    Pass params from get_puzzle_params() to reuse them across many puzzles;
+    difficulty and custom_params are then ignored.
+    """
     # Set up parameters based on difficulty
-    params = DIFFICULTY_PRESETS[difficulty].copy()
-    if custom_params:
-        params.update(custom_params)
+    if params is None:
+        params = get_puzzle_params(difficulty, custom_params)
     
     # Determine total words and correct ratio
     total_words = random.randint(*params["total_words_range"])
@@ -280,8 +395,17 @@ def generate_word_puzzle(difficulty="medium", correct_ratio=None, custom_word=No
     image = Image.new('RGB', IMAGE_SIZE, color=(255, 255, 255))
     draw = ImageDraw.Draw(image)
     
+    # Draw the per-word font sizes and rotations in one batch. The generator is
+    # seeded from the random module so random.seed() still reproduces a puzzle
+    rng = np.random.default_rng(random.getrandbits(64))
+    font_size_range = params["font_size_range"]
+    font_sizes = rng.integers(font_size_range[0], font_size_range[1] + 1, total_words).tolist()
+    angles = rng.choice(ALLOWED_ROTATIONS, total_words).tolist()
+    
     # Generate and place words
-    placed_words = []
+    placed_aabbs = []
+    placed_area = 0
+    spatial_hash = {}
     actual_correct_count = 0  # Counter for successfully placed correct words
     actual_total_count = 0    # Counter for all successfully placed words
     
@@ -289,41 +413,41 @@ def generate_word_puzzle(difficulty="medium", correct_ratio=None, custom_word=No
         is_correct = i < correct_count
         current_word = word if is_correct else scramble_word(word)
         
-        # Choose random font size based on difficulty
-        font_size = random.randint(*params["font_size_range"])
-        font = load_font(font_size)
-        
-        # Choose rotation angle
-        angle = random.choice(ALLOWED_ROTATIONS)
+        # Font size based on difficulty and rotation angle, drawn above
+        font = load_font(font_sizes[i])
+        angle = angles[i]
         
         # Render the word to an image
-        word_image, collision_width, collision_height = render_text_image(current_word, font, angle)
-        if word_image is None:
+        word_mask, collision_width, collision_height = render_text_image(current_word, font, angle)
+        if word_mask is None:
             continue  # Skip if rendering failed
         
+        # Leave less space between words once the image is getting crowded
+        density = (placed_area + collision_width * collision_height) / (IMAGE_SIZE[0] * IMAGE_SIZE[1])
+        spacing = WORD_SPACING // 2 if density > DENSE_LAYOUT_THRESHOLD else WORD_SPACING
+        
         # Try to place the word
-        word_placed = False
-        for attempt in range(MAX_PLACEMENT_ATTEMPTS):
-            placement = try_place_word(IMAGE_SIZE, placed_words, 
-                                      collision_width, collision_height, angle, DEFAULT_SAFE_MARGIN)
+        placement = try_place_word(IMAGE_SIZE, placed_aabbs, spatial_hash,
+                                   collision_width, collision_height, DEFAULT_SAFE_MARGIN,
+                                   rng, spacing)
+        
+        if placement:
+            x, y, aabb = placement
+            # Store word for collision detection
+            add_to_spatial_hash(spatial_hash, aabb, len(placed_aabbs))
+            placed_aabbs.append(aabb)
+            placed_area += collision_width * collision_height
+            
+            # Draw the word by filling black through its cached coverage mask
+            paste_x = int(x - word_mask.width // 2)
+            paste_y = int(y - word_mask.height // 2)
+            image.paste((0, 0, 0), (paste_x, paste_y, paste_x + word_mask.width,
+                                    paste_y + word_mask.height), word_mask)
             
-            if placement:
-                x, y = placement
-                # Store word for collision detection
-                placed_words.append((x, y, collision_width, collision_height, angle))
-                
-                # Draw the word
-                paste_x = int(x - word_image.width // 2)
-                paste_y = int(y - word_image.height // 2)
-                image.paste(word_image, (paste_x, paste_y), word_image)
-                
-                # Update counters for successfully placed words
-                if is_correct:
-                    actual_correct_count += 1
-                actual_total_count += 1
-                
-                word_placed = True
-                break
+            # Update counters for successfully placed words
+            if is_correct:
+                actual_correct_count += 1
+            actual_total_count += 1
     
     # Save the image
     output_path = os.path.join(output_dir, f"{word}_{actual_correct_count}.png")
@@ -335,6 +459,12 @@ def generate_word_puzzle(difficulty="medium", correct_ratio=None, custom_word=No
     return output_path
 
 
+def _generate_puzzle_worker(puzzle_kwargs):
+    """Process pool entry point that reseeds from OS entropy first so workers don't repeat puzzles"""
+    random.seed()
+    return generate_word_puzzle(**puzzle_kwargs)
+
+
 def main():
     # Define default output directory to be in 'output' folder in the same directory as the script
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -356,16 +486,26 @@ def main():
     parser.add_argument('--count', type=int, default=1,
                         help='Number of puzzle images to generate')
     args = parser.parse_args()
+    if args.word and len(set(args.word.lower())) < 2:
+        parser.error("--word needs at least two different letters so it can be scrambled")
     
     print(f"Generating {args.count} puzzle images...")
-    for i in range(args.count):
-        # For multiple images with same word, we'll generate different layouts
-        generate_word_puzzle(
-            difficulty=args.difficulty,
-            correct_ratio=args.correct_ratio,
-            custom_word=args.word,
-            output_dir=args.output_dir,
-        )
+    # The difficulty is fixed for the run, so resolve its parameters once
+    params = get_puzzle_params(args.difficulty)
+    
+    # Puzzles are independent, so generate them in parallel across processes
+    # For multiple images with same word, we'll generate different layouts
+    puzzle_kwargs = dict(
+        correct_ratio=args.correct_ratio,
+        custom_word=args.word,
+        output_dir=args.output_dir,
+        params=params,
+    )
+    max_workers = max(1, min(args.count, os.cpu_count() or 1))
+    # Each worker loads all the fonts it can need once, up front
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=preload_fonts,
+                             initargs=(params["font_size_range"],)) as executor:
+        list(executor.map(_generate_puzzle_worker, [puzzle_kwargs] * args.count))
     print(f"Completed generating {args.count} puzzle images.")
 
 
@@ -22,6 +22,8 @@ import string
 import sys
 import os
 import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from PIL import Image, ImageDraw, ImageFont
@@ -31,6 +33,56 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "Pillow"])
     from PIL import Image, ImageDraw, ImageFont
 
+# Prioritize Helvetica in all common locations
+FONT_PATHS = [
+    # MacOS Helvetica locations
+    '/Library/Fonts/Helvetica.ttf',
+    '/System/Library/Fonts/Helvetica.ttc',
+    '/Library/Fonts/Helvetica.dfont',
+    # Linux Helvetica/similar locations
+    '/usr/share/fonts/truetype/fonts-linuxlibertine/LinLibertine_R.ttf',  # Linux alternative to Helvetica
+    '/usr/share/fonts/opentype/helvetica/Helvetica.otf',
+    # Windows Helvetica/similar locations
+    'C:/Windows/Fonts/helvetica.ttf',
+    'C:/Windows/Fonts/arial.ttf',  # Windows alternative to Helvetica
+    # Fallbacks if Helvetica is not available
+    '/Library/Fonts/Arial.ttf',
+    '/System/Library/Fonts/SFNSDisplay.ttf',  # San Francisco (modern Apple font)
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+]
+
+# Font files present on this machine, probed once at import instead of per load
+_AVAILABLE_FONT_PATHS = [font_path for font_path in FONT_PATHS if os.path.exists(font_path)]
+
+
+@functools.lru_cache(maxsize=32)
+def _load_font(size):
+    """
+    Get Helvetica font with fallback mechanism if Helvetica is not available.
+    Fonts are cached per size and shared by all generators.
+    
+    Args:
+        size (int): Font size
+        
+    Returns:
+        PIL.ImageFont: Font to use
+    """
+    # Try each available font path
+    for font_path in _AVAILABLE_FONT_PATHS:
+        try:
+            return ImageFont.truetype(font_path, size)
+        except Exception:
+            continue
+    
+    # If no fonts work, create a default font
+    try:
+        # Try to use PIL's built-in default font with specified size
+        return ImageFont.load_default().font_variant(size=size)
+    except Exception:
+        # Absolute fallback
+        return ImageFont.load_default()
+
+
 class LetterPuzzleGenerator:
     """Class to generate letter matching puzzles."""
     
@@ -84,6 +136,13 @@ class LetterPuzzleGenerator:
             'Z': ['S', 'X', 'N']
         }
         
+        # Replacement candidates per letter, falling back to any other letter
+        self._replacement_pool = {
+            letter: tuple(self.visually_similar_letters.get(letter) or
+                          [c for c in string.ascii_uppercase if c != letter])
+            for letter in string.ascii_uppercase
+        }
+        
         # Image settings - landscape orientation for better horizontal option placement
         if self.difficulty == 'easy':
             self.width = 900
@@ -97,54 +156,49 @@ class LetterPuzzleGenerator:
         self.mask_color = (240, 240, 240)        # Light grey mask instead of white
         self.border_color = (100, 100, 100)      # Darker border for better visibility
         self.font_size = 150
+        self._strip_masks = {}  # (width, strip_height, mask_strips) -> mask image
+        self._text_bboxes = {}  # letter string -> bounding box in self.font
         
         # Always use Helvetica font
-        self.font = self._get_font(self.font_size)
+        self.font = _load_font(self.font_size)
     
-    def _get_font(self, size):
+    def _get_text_bbox(self, text):
         """
-        Get Helvetica font with fallback mechanism if Helvetica is not available.
+        Get the bounding box of text drawn at the origin in the main font, cached per string.
         
         Args:
-            size (int): Font size
+            text (str): Text to measure
             
         Returns:
-            PIL.ImageFont: Font to use
+            tuple: (left, top, right, bottom), or None if the font cannot measure text
         """
-        # Prioritize Helvetica in all common locations
-        font_paths = [
-            # MacOS Helvetica locations
-            '/Library/Fonts/Helvetica.ttf',
-            '/System/Library/Fonts/Helvetica.ttc',
-            '/Library/Fonts/Helvetica.dfont',
-            # Linux Helvetica/similar locations
-            '/usr/share/fonts/truetype/fonts-linuxlibertine/LinLibertine_R.ttf',  # Linux alternative to Helvetica
-            '/usr/share/fonts/opentype/helvetica/Helvetica.otf',
-            # Windows Helvetica/similar locations
-            'C:/Windows/Fonts/helvetica.ttf',
-            'C:/Windows/Fonts/arial.ttf',  # Windows alternative to Helvetica
-            # Fallbacks if Helvetica is not available
-            '/Library/Fonts/Arial.ttf',
-            '/System/Library/Fonts/SFNSDisplay.ttf',  # San Francisco (modern Apple font)
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-        ]
-        
-        # Try each font path
-        for font_path in font_paths:
-            if os.path.exists(font_path):
+        if text not in self._text_bboxes:
+            try:
+                bbox = tuple(self.font.getbbox(text))
+            except (AttributeError, TypeError):
                 try:
-                    return ImageFont.truetype(font_path, size)
+                    # Fallback for older Pillow versions
+                    bbox = (0, 0) + tuple(self.font.getsize(text))
                 except Exception:
-                    continue
+                    bbox = None
+            self._text_bboxes[text] = bbox
+        return self._text_bboxes[text]
+    
+    def _get_text_size(self, text):
+        """
+        Get the size of text in the main font.
         
-        # If no fonts work, create a default font
-        try:
-            # Try to use PIL's built-in default font with specified size
-            return ImageFont.load_default().font_variant(size=size)
-        except Exception:
-            # Absolute fallback
-            return ImageFont.load_default()
-
+        Args:
+            text (str): Text to measure
+            
+        Returns:
+            tuple: (width, height), or None if the font cannot measure text
+        """
+        bbox = self._get_text_bbox(text)
+        if bbox is None:
+            return None
+        return bbox[2] - bbox[0], bbox[3] - bbox[1]
+    
     def generate_random_letters(self, count):
         """
         Generate a random combination of letters.
@@ -170,46 +224,66 @@ class LetterPuzzleGenerator:
             list: List of letter options
             int: Index of the correct option (0-based)
         """
-        options = []
         correct_index = random.randint(0, self.num_options - 1)
+        options = [None] * self.num_options
+        options[correct_index] = correct_letters
+        seen_options = {correct_letters}
         
         for i in range(self.num_options):
             if i == correct_index:
-                options.append(correct_letters)
-            else:
-                # Generate an option with one letter changed to a visually similar letter or random letter
-                while True:
-                    # Choose a random position to change
-                    pos = random.randint(0, len(correct_letters) - 1)
-                    
-                    # Get the letter at that position
-                    letter = correct_letters[pos]
-                    
-                    # Get similar letters or fallback to a random different letter
-                    similar_letters = self.visually_similar_letters.get(letter, [])
-                    
-                    # If we have similar letters for this letter, use one; otherwise choose a random letter
-                    if similar_letters:
-                        replacement = random.choice(similar_letters)
-                    else:
-                        # Fallback - choose any letter except the original
-                        replacement = random.choice([c for c in string.ascii_uppercase if c != letter])
-                    
-                    # Create the new option by replacing that one letter
-                    new_option = correct_letters[:pos] + replacement + correct_letters[pos+1:]
-                    
-                    # Make sure it's unique and different from the correct option
-                    if new_option != correct_letters and new_option not in options:
-                        options.append(new_option)
-                        break
-        
-        # Check if there are any duplicate options
-        if len(set(options)) != len(options):
-            # If duplicates found, recursively regenerate all options
-            return self.generate_options(correct_letters)
+                continue
+            # Generate an option with one letter changed to a visually similar letter or random letter
+            while True:
+                # Choose a random position to change
+                pos = random.randrange(len(correct_letters))
+                
+                # Pick a replacement from the precomputed pool for that letter
+                replacement = random.choice(self._replacement_pool[correct_letters[pos]])
+                
+                # Create the new option by replacing that one letter
+                new_option = correct_letters[:pos] + replacement + correct_letters[pos+1:]
+                
+                # Make sure it's unique and different from the correct option
+                if new_option not in seen_options:
+                    break
+            seen_options.add(new_option)
+            options[i] = new_option
             
         return options, correct_index
     
+    def _get_option_size(self):
+        """
+        Get the size of the area each masked option is drawn in.
+        
+        Returns:
+            tuple: (option_width, option_height)
+        """
+        return self.width // self.num_options - 20, self.height // 3
+    
+    def _layout_masked_letters(self, letter_string, mask_strips):
+        """
+        Work out where masked letters and their strips go within an option area.
+        
+        Args:
+            letter_string (str): Letters to draw with masking
+            mask_strips (int): Number of horizontal mask strips
+            
+        Returns:
+            tuple: (pos_x, pos_y, text_width, strip_height) relative to the option area
+        """
+        option_width, option_height = self._get_option_size()
+        
+        # Get text size, with an ultra fallback if the font cannot measure it
+        text_width, text_height = (self._get_text_size(letter_string) or
+                                   (option_width // 2, option_height // 2))
+        
+        # Calculate position to center text
+        pos_x = (option_width - text_width) // 2
+        pos_y = (option_height - text_height) // 2
+        
+        strip_height = (option_height - 5) // (mask_strips * 2)
+        return pos_x, pos_y, text_width, strip_height
+    
     def create_masked_letter_image(self, letter_string, mask_strips=5):
         """
         Create an image with masked letters, improved for better visibility.
@@ -222,39 +296,80 @@ class LetterPuzzleGenerator:
             PIL.Image: Image with masked letters
         """
         # Create a new image for this option
-        option_width = self.width // self.num_options - 20
-        option_height = self.height // 3
-        img = Image.new('RGB', (option_width, option_height), self.background_color)
-        draw = ImageDraw.Draw(img)
+        img = Image.new('RGB', self._get_option_size(), self.background_color)
+        self._draw_masked_letters_at(img, ImageDraw.Draw(img), 0, 0, letter_string, mask_strips)
+        return img
+    
+    def draw_masked_letters(self, img, draw, origin_x, origin_y, letter_string, mask_strips=5):
+        """
+        Draw masked letters straight onto the puzzle image.
         
-        # Get text size using getbbox or older method as fallback
-        try:
-            bbox = self.font.getbbox(letter_string)
-            text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
-        except AttributeError:
-            try:
-                # Fallback for older Pillow versions
-                text_width, text_height = self.font.getsize(letter_string)
-            except Exception:
-                # Ultra fallback
-                text_width, text_height = option_width // 2, option_height // 2
+        Letters or strips that would spill outside the option area are rendered
+        through create_masked_letter_image instead, which clips them to it.
         
-        # Calculate position to center text
-        pos_x = (option_width - text_width) // 2
-        pos_y = (option_height - text_height) // 2
+        Args:
+            img (PIL.Image): Puzzle image to draw on
+            draw (PIL.ImageDraw): Drawing context for img
+            origin_x (int): Left edge of the option area in img
+            origin_y (int): Top edge of the option area in img
+            letter_string (str): Letters to draw with masking
+            mask_strips (int): Number of horizontal mask strips
+        """
+        option_width, option_height = self._get_option_size()
+        pos_x, pos_y, text_width, _ = self._layout_masked_letters(letter_string, mask_strips)
+        bbox = self._get_text_bbox(letter_string)
+        
+        # Strips overhanging the bottom only cover background, so they need no clipping
+        fits = (bbox is not None and
+                pos_x - 5 >= 0 and pos_x + text_width + 5 < option_width and
+                pos_x + bbox[0] >= 0 and pos_x + bbox[2] <= option_width and
+                pos_y + min(bbox[1], 10) >= 0 and pos_y + bbox[3] <= option_height)
+        if fits:
+            self._draw_masked_letters_at(img, draw, origin_x, origin_y, letter_string, mask_strips)
+        else:
+            img.paste(self.create_masked_letter_image(letter_string, mask_strips), (origin_x, origin_y))
+    
+    def _draw_masked_letters_at(self, img, draw, origin_x, origin_y, letter_string, mask_strips):
+        """
+        Draw letters and their mask strips with the option area at the given origin.
+        
+        Args:
+            img (PIL.Image): Image to draw on
+            draw (PIL.ImageDraw): Drawing context for img
+            origin_x (int): Left edge of the option area in img
+            origin_y (int): Top edge of the option area in img
+            letter_string (str): Letters to draw with masking
+            mask_strips (int): Number of horizontal mask strips
+        """
+        pos_x, pos_y, text_width, strip_height = self._layout_masked_letters(letter_string, mask_strips)
         
         # Draw the text directly, no background rectangle
-        draw.text((pos_x, pos_y), letter_string, font=self.font, fill=self.text_color)
+        draw.text((origin_x + pos_x, origin_y + pos_y), letter_string, font=self.font, fill=self.text_color)
         
-        # Create mask strips that match the background color (no border)
-        strip_height = (option_height - 5) // (mask_strips * 2)
-        for i in range(mask_strips):
-            strip_y = pos_y + (i * strip_height * 2)
-            # Draw a horizontal mask strip across the text using the background color
-            draw.rectangle([(pos_x - 5, strip_y + 10), (pos_x + text_width + 5, strip_y + 10 + strip_height)], 
-                          fill=self.background_color)
+        # Cover the text with mask strips that match the background color (no border)
+        strip_mask = self._get_strip_mask(text_width + 11, strip_height, mask_strips)
+        img.paste(self.background_color, (origin_x + pos_x - 5, origin_y + pos_y + 10), strip_mask)
+    
+    def _get_strip_mask(self, width, strip_height, mask_strips):
+        """
+        Get a cached mask with horizontal strips spaced one strip height apart.
         
-        return img
+        Args:
+            width (int): Width of the strips in pixels
+            strip_height (int): Gap between strips; each strip is one pixel taller
+            mask_strips (int): Number of strips
+            
+        Returns:
+            PIL.Image: 'L' mode mask, opaque where the strips are
+        """
+        key = (width, strip_height, mask_strips)
+        if key not in self._strip_masks:
+            period = strip_height * 2
+            height = (mask_strips - 1) * period + strip_height + 1
+            opaque_row, clear_row = b'\xff' * width, b'\x00' * width
+            rows = (opaque_row if y % period <= strip_height else clear_row for y in range(height))
+            self._strip_masks[key] = Image.frombytes('L', (width, height), b''.join(rows))
+        return self._strip_masks[key]
     
     def generate_puzzle(self, output_filename=None):
         """
@@ -278,14 +393,8 @@ class LetterPuzzleGenerator:
         correct_option_number = correct_index + 1  # 1-based indexing
         
         # Draw the question text at the top of the image
-        try:
-            bbox = self.font.getbbox(question_letters)
-            text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
-        except (AttributeError, TypeError):
-            try:
-                text_width, text_height = self.font.getsize(question_letters)
-            except:
-                text_width, text_height = self.width // 3, self.height // 8
+        text_width, text_height = (self._get_text_size(question_letters) or
+                                   (self.width // 3, self.height // 8))
         
         # Calculate position
         q_pos_x = (self.width - text_width) // 2
@@ -298,22 +407,20 @@ class LetterPuzzleGenerator:
         
         # Draw options at bottom
         option_width = self.width // self.num_options
+        masked_width, masked_height = self._get_option_size()
         for i, option_text in enumerate(options):
-            # Create masked option image
-            option_img = self.create_masked_letter_image(option_text, mask_intensity)
-            
             # Calculate position
-            x_pos = i * option_width + (option_width - option_img.width) // 2
+            x_pos = i * option_width + (option_width - masked_width) // 2
             y_pos = self.height // 3 + 70
             
-            # Paste option onto main image
-            img.paste(option_img, (x_pos, y_pos))
+            # Draw masked option straight onto main image
+            self.draw_masked_letters(img, draw, x_pos, y_pos, option_text, mask_intensity)
             
             # Draw box around the option
             box_padding = 10
             draw.rectangle(
                 [(x_pos - box_padding, y_pos - box_padding), 
-                 (x_pos + option_img.width + box_padding, y_pos + option_img.height + box_padding)],
+                 (x_pos + masked_width + box_padding, y_pos + masked_height + box_padding)],
                 outline=self.border_color,
                 width=3  # Thicker border for better visibility
             )
@@ -323,7 +430,7 @@ class LetterPuzzleGenerator:
             number_y = self.height // 3 + 20
             
             # Draw number
-            num_font = self._get_font(36)
+            num_font = _load_font(36)
             draw.text((number_x - 10, number_y + 50), str(i+1), 
                      font=num_font, fill=self.text_color)
         
@@ -333,6 +440,34 @@ class LetterPuzzleGenerator:
         
         return img, question_letters, correct_option_number
 
+@functools.lru_cache(maxsize=None)
+def _get_generator(difficulty):
+    """Get the generator for a difficulty, built once per process."""
+    return LetterPuzzleGenerator(difficulty)
+
+
+def _generate_puzzle_file(difficulty, difficulty_dir):
+    """
+    Generate one puzzle and save it as <question_letters>_<answer>.png.
+    Runs in a worker process, so it reseeds first to avoid repeated puzzles.
+    
+    Args:
+        difficulty (str): Difficulty level ('easy', 'medium', or 'hard')
+        difficulty_dir (str): Directory to save the puzzle in
+        
+    Returns:
+        tuple: (output_file, correct_option_number)
+    """
+    # Reseed from OS entropy so workers don't repeat puzzles
+    random.seed()
+    # First generate the puzzle to get the answer without saving
+    puzzle_img, question_letters, answer = _get_generator(difficulty).generate_puzzle()
+    # Then save with the answer as the filename in the difficulty subfolder
+    output_file = os.path.join(difficulty_dir, f"{question_letters}_{answer}.png")
+    puzzle_img.save(output_file)
+    return output_file, answer
+
+
 if __name__ == "__main__":
     # Set up command line argument parsing
     parser = argparse.ArgumentParser(description='Generate letter matching puzzles with masked options.')
@@ -353,26 +488,33 @@ if __name__ == "__main__":
     difficulties = ['easy', 'medium', 'hard']
     total_puzzles = 0
     
+    difficulty_dirs = {}
+    
     for difficulty in difficulties:
         # Create difficulty-specific subdirectory
         difficulty_dir = os.path.join(output_dir, difficulty)
         if not os.path.exists(difficulty_dir):
             os.makedirs(difficulty_dir)
             print(f"Created {difficulty} subdirectory: {difficulty_dir}")
+        difficulty_dirs[difficulty] = difficulty_dir
+    
+    # Puzzles are independent, so generate all of them in parallel across processes
+    with ProcessPoolExecutor() as executor:
+        futures = {
+            difficulty: [executor.submit(_generate_puzzle_file, difficulty, difficulty_dirs[difficulty])
+                         for _ in range(puzzle_count)]
+            for difficulty in difficulties
+        }
         
-        print(f"Generating {puzzle_count} {difficulty} puzzles...")
-        
-        # Generate the specified number of puzzles for this difficulty
-        for i in range(puzzle_count):
-            generator = LetterPuzzleGenerator(difficulty)
-            # First generate the puzzle to get the answer without saving
-            puzzle_img, question_letters, answer = generator.generate_puzzle()
-            # Then save with the answer as the filename in the difficulty subfolder
-            output_file = os.path.join(difficulty_dir, f"{question_letters}_{answer}.png")
-            puzzle_img.save(output_file)
+        for difficulty in difficulties:
+            print(f"Generating {puzzle_count} {difficulty} puzzles...")
             
-            total_puzzles += 1
-            print(f"  [{i+1}/{puzzle_count}] Generated {difficulty} puzzle: {output_file} (Answer: Option {answer})")
+            # Report the puzzles for this difficulty in order as they finish
+            for i, future in enumerate(futures[difficulty]):
+                output_file, answer = future.result()
+                
+                total_puzzles += 1
+                print(f"  [{i+1}/{puzzle_count}] Generated {difficulty} puzzle: {output_file} (Answer: Option {answer})")
     
     print(f"Done! Successfully generated {total_puzzles} puzzles ({puzzle_count} for each difficulty level).")
     print(f"All puzzles saved in the output folder: {output_dir}")
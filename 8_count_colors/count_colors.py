@@ -1,8 +1,153 @@
 import random
+import io
 import string
 from PIL import Image, ImageDraw, ImageFont
 import os
 import argparse
+import functools
+import math
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    # OpenCV is optional; without it images are saved with Pillow
+    cv2 = None
+
+# Define colors with their names and RGB values
+COLORS = [
+    ("red", (255, 0, 0)),
+    ("green", (0, 255, 0)),
+    ("blue", (0, 0, 255)),
+    ("yellow", (255, 255, 0)),
+    ("purple", (128, 0, 128)),
+    ("brown", (165, 42, 42)),
+    ("black", (0, 0, 0)),
+]
+
+# Every (color name, display name, display RGB) where the word is shown in another color
+ALL_PAIRS = [(name, display_name, display_rgb)
+             for name, _ in COLORS
+             for display_name, display_rgb in COLORS if display_name != name]
+
+# Characters used in the random UUID part of file names
+_UUID_ALPHABET = string.ascii_uppercase + string.digits
+
+# Bold fonts first, then regular Arial
+FONT_CANDIDATES = ("Arial Bold.ttf", "Arial-Bold.ttf", "Arial.ttf")
+
+@functools.lru_cache(maxsize=None)
+def find_font_path(font_size, candidates=FONT_CANDIDATES):
+    """Return the first candidate font that loads, or None to use the default font"""
+    for font_path in candidates:
+        try:
+            ImageFont.truetype(font_path, font_size)
+            return font_path
+        except IOError:
+            continue
+    return None
+
+@functools.lru_cache(maxsize=None)
+def load_font(font_path, font_size):
+    """Load a font found by find_font_path, once per process"""
+    if font_path is None:
+        # Use default font as last resort
+        return ImageFont.load_default()
+    return ImageFont.truetype(font_path, font_size)
+
+def save_png(img, filepath):
+    """Save an RGB image as PNG, using OpenCV's faster RLE encoder when available"""
+    if cv2 is None:
+        # Text in Pillow's default font has few enough colors for a lossless palette;
+        # anti-aliased TrueType text has about a thousand and stays RGB
+        if img.getcolors(256) is not None:
+            img = img.convert('P', palette=Image.ADAPTIVE, colors=256)
+        # Encode in memory and write the file in one go rather than many small writes
+        buf = io.BytesIO()
+        img.save(buf, format='PNG', optimize=False, compress_level=1)
+        with open(filepath, 'wb') as f:
+            f.write(buf.getbuffer())
+        return
+    # cv2.imwrite reports failure by returning False rather than raising
+    if not cv2.imwrite(filepath, cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR),
+                       [cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE,
+                        cv2.IMWRITE_PNG_COMPRESSION, 1]):
+        raise OSError(f"Could not write image to {filepath}")
+
+def _render_one(word_count, positions, font_path, font_size, output_dir,
+                width, height, background_color, save_queue=None):
+    """Draw and save one image, or queue it for saving, returning its path and the colors used"""
+    # A generator per image, seeded from OS entropy, so worker processes don't draw the same images
+    rnd = random.Random()
+    font = load_font(font_path, font_size)
+    
+    # Create a new image with a light gray background
+    img = Image.new('RGB', (width, height), background_color)
+    draw = ImageDraw.Draw(img)
+    
+    used_color_names = set()
+    used_display_colors = set()
+    
+    # Pick distinct combinations of color name and a different display color
+    chosen = rnd.sample(ALL_PAIRS, word_count)
+    for i, (color_name, display_name, display_rgb) in enumerate(chosen):
+        used_color_names.add(color_name)
+        used_display_colors.add(display_name)
+        
+        # Draw the text with the selected display color
+        text = color_name.upper()
+        text_width = draw.textlength(text, font=font)
+        position = (positions[i][0] - text_width // 2, positions[i][1] - font_size//4)
+        draw.text(position, text, font=font, fill=display_rgb)
+    
+    # Count unique colors (both mentioned and displayed)
+    unique_colors = set()
+    for color_name, display_name, _ in chosen:
+        unique_colors.add(color_name)
+        unique_colors.add(display_name)
+    
+    # Generate a 4-character random UUID
+    random_uuid = ''.join(rnd.choices(_UUID_ALPHABET, k=4))
+    # Save the image with the count of unique colors and random UUID as the filename
+    filename = f"{len(unique_colors)}_{random_uuid}.png"
+    filepath = os.path.join(output_dir, filename)
+    if save_queue is None:
+        save_png(img, filepath)
+    else:
+        save_queue.put((img, filepath))
+    
+    return filepath, used_color_names, used_display_colors, unique_colors
+
+def _render_batch(batch_count, **render_kwargs):
+    """Render a run of images while a writer thread encodes and saves the previous ones"""
+    save_queue = queue.Queue(maxsize=4)
+    errors = []
+    
+    def _writer():
+        while True:
+            item = save_queue.get()
+            if item is None:
+                break
+            try:
+                save_png(*item)
+            except Exception as e:
+                errors.append(e)
+    
+    writer = threading.Thread(target=_writer, daemon=True)
+    writer.start()
+    try:
+        results = [_render_one(save_queue=save_queue, **render_kwargs)
+                   for _ in range(batch_count)]
+    finally:
+        # Let the writer finish every queued image before reporting them as saved
+        save_queue.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
+    return results
 
 def main():
     # Parse command-line arguments
@@ -17,17 +162,6 @@ def main():
     # Get the number of images to generate
     image_count = max(1, args.count)  # Ensure at least 1 image is generated
     
-    # Define colors with their names and RGB values
-    colors = [
-        ("red", (255, 0, 0)),
-        ("green", (0, 255, 0)),
-        ("blue", (0, 0, 255)),
-        ("yellow", (255, 255, 0)),
-        ("purple", (128, 0, 128)),
-        ("brown", (165, 42, 42)),
-        ("black", (0, 0, 0)),
-    ]
-    
     # Set image parameters
     width, height = 800, 600
     background_color = (240, 240, 240)  # Light gray background
@@ -36,21 +170,8 @@ def main():
     # More words = smaller font
     font_size = max(30, int(240 / (word_count ** 0.5)))
     
-    # Try to load a bold font with calculated size, use default if not available
-    try:
-        # Using bold font variant with dynamic size
-        font = ImageFont.truetype("Arial Bold.ttf", font_size)
-    except IOError:
-        try:
-            # Try alternative bold font names
-            font = ImageFont.truetype("Arial-Bold.ttf", font_size)
-        except IOError:
-            try:
-                # If bold fonts not found, use regular font with the calculated size
-                font = ImageFont.truetype("Arial.ttf", font_size)
-            except IOError:
-                # Use default font as last resort
-                font = ImageFont.load_default()
+    # Workers load the font themselves, since font objects don't always pickle
+    font_path = find_font_path(font_size)
     
     # Create output directory if it doesn't exist
     output_dir = os.path.join(os.path.dirname(__file__), "output")
@@ -67,56 +188,23 @@ def main():
     
     print(f"Generating {image_count} image(s) with {word_count} color word(s) each")
     
-    for img_idx in range(image_count):
-        # Create a new image with a light gray background
-        img = Image.new('RGB', (width, height), background_color)
-        draw = ImageDraw.Draw(img)
-        
-        used_combinations = []
-        used_color_names = set()
-        used_display_colors = set()
-        
-        for i in range(word_count):
-            # Select a random color name
-            color_name, color_rgb = random.choice(colors)
-            
-            # Select a different color for display
-            display_options = [c for c in colors if c[0] != color_name]
-            display_name, display_rgb = random.choice(display_options)
-            
-            # Ensure combination hasn't been used before
-            while (color_name, display_name) in used_combinations:
-                color_name, color_rgb = random.choice(colors)
-                display_options = [c for c in colors if c[0] != color_name]
-                display_name, display_rgb = random.choice(display_options)
-            
-            used_combinations.append((color_name, display_name))
-            used_color_names.add(color_name)
-            used_display_colors.add(display_name)
-            
-            # Draw the text with the selected display color
-            text = color_name.upper()
-            text_width = draw.textlength(text, font=font)
-            position = (positions[i][0] - text_width // 2, positions[i][1] - font_size//4)
-            draw.text(position, text, font=font, fill=display_rgb)
-        
-        # Count unique colors (both mentioned and displayed)
-        unique_colors = set()
-        for color_name, display_name in used_combinations:
-            unique_colors.add(color_name)
-            unique_colors.add(display_name)
-        
-        # Generate a 4-character random UUID
-        random_uuid = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-        # Save the image with the count of unique colors and random UUID as the filename
-        filename = f"{len(unique_colors)}_{random_uuid}.png"
-        filepath = os.path.join(output_dir, filename)
-        img.save(filepath)
-        
-        print(f"Image {img_idx+1}/{image_count} generated: {filepath}")
-        print(f"  Used color names: {', '.join(used_color_names)}")
-        print(f"  Used display colors: {', '.join(used_display_colors)}")
-        print(f"  Total unique colors: {len(unique_colors)}")
+    cpu_count = os.cpu_count() or 1
+    render = functools.partial(_render_batch, word_count=word_count, positions=positions,
+                               font_path=font_path, font_size=font_size,
+                               output_dir=output_dir, width=width, height=height,
+                               background_color=background_color)
+    # Each worker renders a run of images so its writer thread can overlap with drawing
+    max_workers = min(image_count, cpu_count)
+    batch_size = math.ceil(image_count / max_workers)
+    batches = [min(batch_size, image_count - start)
+               for start in range(0, image_count, batch_size)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = (result for batch in executor.map(render, batches) for result in batch)
+        for img_idx, (filepath, used_color_names, used_display_colors, unique_colors) in enumerate(results):
+            print(f"Image {img_idx+1}/{image_count} generated: {filepath}")
+            print(f"  Used color names: {', '.join(used_color_names)}")
+            print(f"  Used display colors: {', '.join(used_display_colors)}")
+            print(f"  Total unique colors: {len(unique_colors)}")
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,62 @@
 import random
-from PIL import Image, ImageDraw, ImageFont
+import io
+import functools
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import numpy as np
 
+try:
+    import cv2
+except ImportError:
+    # OpenCV is optional; without it images are saved with Pillow
+    cv2 = None
+
 TOTAL_NUMBER = 9
 STARS = 3   # doenst have to be star, could also be 8 x's
 NUMBER_OF_EXTRA_CLUES = 2    # This is the number of extra clues might be added
 
-def should_add_extra_clues(clues):
-    return clues.count("x") < 3
+# Clue image layout
+CELL_SIZE = 100  # Width and height of each grid cell (in pixels)
+GRID_SIZE = CELL_SIZE * 3 + 3  # Total grid size (3x3)
+MARGIN = 20  # Margin size (in pixels)
+TILE_SIZE = GRID_SIZE + MARGIN * 4  # Size of one clue, grid plus margins
+BG_COLOR = "white"  # Background color of the image
+TEXT_COLOR = "black"  # Text color
+BORDER_COLOR = "black"  # Border color
+BORDER_WIDTH = 4  # Border width in pixels
+STAR_COLOR = "blue"  # Color for the star
+CROSS_COLOR = "red"  # Color for the cross
+DIGIT_FONT_SIZE = 60
+
+# Fancy shooting star shape, relative to the top-left corner of its cell
+STAR_TEMPLATE = [
+    (CELL_SIZE // 2, 10),
+    (CELL_SIZE // 2 + 10, CELL_SIZE // 2 - 10),
+    (CELL_SIZE - 10, CELL_SIZE // 2 - 10),
+    (CELL_SIZE // 2 + 20, CELL_SIZE // 2 + 10),
+    (CELL_SIZE // 2 + 30, CELL_SIZE - 10),
+    (CELL_SIZE // 2, CELL_SIZE // 2 + 20),
+    (CELL_SIZE // 2 - 30, CELL_SIZE - 10),
+    (CELL_SIZE // 2 - 20, CELL_SIZE // 2 + 10),
+    (10, CELL_SIZE // 2 - 10),
+    (CELL_SIZE // 2 - 10, CELL_SIZE // 2 - 10),
+]
+
+@functools.lru_cache(maxsize=None)
+def _get_font(name, size):
+    """
+    Load a TTF font once, falling back to the default font if it isn't available.
+
+    :param name: Font file name
+    :param size: Font size in points
+    :return: The loaded font
+    """
+    try:
+        return ImageFont.truetype(name, size)
+    except IOError:
+        return ImageFont.load_default()
 
 def generate_render(star_position, number_of_x, unnecessary=[]):
     """
@@ -24,11 +73,15 @@ def generate_render(star_position, number_of_x, unnecessary=[]):
         clues[star_position] = "*"
     else:
         # Add necessary clues
-        for x_position in [n for n in range(TOTAL_NUMBER) if n not in unnecessary and n != star_position]:
+        excluded = set(unnecessary)
+        excluded.add(star_position)
+        x_count = 0
+        for x_position in [n for n in range(TOTAL_NUMBER) if n not in excluded]:
             clues[x_position] = "x"
+            x_count += 1
 
-        # Add extra clues
-        if should_add_extra_clues(clues):
+        # Add extra clues when there are too few x's
+        if x_count < 3:
             for x_position in random.sample(unnecessary, NUMBER_OF_EXTRA_CLUES):
                 clues[x_position] = "x"
     return clues
@@ -61,10 +114,11 @@ def render_result(clues, answer):
     print("Answer is:")
     print_box(3, 3, answer)
 
-def generate_clues_and_answer():
+def generate_clues_and_answer(verbose=True):
     # generate answer
     answer = list(range(TOTAL_NUMBER))
     random.shuffle(answer)
+    pos = {number: index for index, number in enumerate(answer)}  # number -> position in answer
 
     # create clues
     clues = dict()
@@ -72,16 +126,16 @@ def generate_clues_and_answer():
     # generate stars
     stars = random.sample(range(TOTAL_NUMBER), STARS)
     for star in stars:
-        clues[star] = generate_render(answer.index(star), TOTAL_NUMBER-1)   # 8 x's equals a star
+        clues[star] = generate_render(pos[star], TOTAL_NUMBER-1)   # 8 x's equals a star
 
     # generate cluess for rest of numbers
     needed_clues = TOTAL_NUMBER - STARS
-    certain_indice = [answer.index(star) for star in stars]
+    certain_indice = [pos[star] for star in stars]
     for number in answer:
         if number in stars: continue
         needed_clues -= 1
-        clues[number] = generate_render(answer.index(number), needed_clues, certain_indice)
-        certain_indice.append(answer.index(number))
+        clues[number] = generate_render(pos[number], needed_clues, certain_indice)
+        certain_indice.append(pos[number])
 
     # re format answer and clues
     answer = [str(n + 1) for n in answer]
@@ -89,125 +143,177 @@ def generate_clues_and_answer():
     clues = dict(sorted(clues.items()))
 
     # return clues and answer
+    if verbose:
+        print_clues_and_answer(clues, answer)
+    return clues, answer
+
+def print_clues_and_answer(clues, answer):
+    """
+    Print each clue's cells and the answer, one line each.
+
+    :param clues: Dictionary mapping clue numbers to their 9 cells
+    :param answer: List of the answer digits
+    """
     for k, v in clues.items():
         print(k, v)
     print("answer:", answer)
-    return clues, answer
 
-def convert_list_to_image(data, digit):
-    # Define grid and cell sizes
-    cell_size = 100  # Width and height of each grid cell (in pixels)
-    grid_size = cell_size * 3 + 3  # Total grid size (3x3)
-    margin = 20  # Margin size (in pixels)
-    canvas_size = grid_size + margin * 4  # Total canvas size
-    bg_color = "white"  # Background color of the image
-    text_color = "black"  # Text color
-    border_color = "black"  # Border color
-    border_width = 4  # Border width in pixels
-    star_color = "blue"  # Color for the star
-    cross_color = "red"  # Color for the cross
-
-    # Create a blank canvas with margins
-    canvas_image = Image.new("RGB", (canvas_size, canvas_size), bg_color)
-
-    # Create the grid image
-    grid_image = Image.new("RGB", (grid_size, grid_size), bg_color)
-    draw = ImageDraw.Draw(grid_image)
+def new_clues_image(columns, rows):
+    """
+    Create an image with room for columns x rows clues, each with its empty grid drawn.
 
-    # Optional: Load a font (use a TTF font if available)
-    try:
-        font = ImageFont.truetype("arial.ttf", size=30)  # Use a TTF font if available
-    except IOError:
-        font = ImageFont.load_default()  # Fall back to default font
+    :param columns: Number of clues across
+    :param rows: Number of clues down
+    :return: The image, ready for draw_cell_into
+    """
+    # Fill the border bands of one clue's grid in an array, clipped to the grid
+    tile = np.empty((TILE_SIZE, TILE_SIZE, 3), dtype=np.uint8)
+    tile[:] = ImageColor.getrgb(BG_COLOR)
+    grid = tile[MARGIN:MARGIN + GRID_SIZE, MARGIN * 3:MARGIN * 3 + GRID_SIZE]
+    for i in range(4):  # Lines at every cell edge, including the bottom and right-most borders
+        start = max(0, i * CELL_SIZE - BORDER_WIDTH // 2 + 1)
+        end = i * CELL_SIZE + BORDER_WIDTH // 2 + 1
+        grid[start:end, :] = ImageColor.getrgb(BORDER_COLOR)
+        grid[:, start:end] = ImageColor.getrgb(BORDER_COLOR)
+
+    # Repeat it for every clue
+    return Image.fromarray(np.tile(tile, (rows, columns, 1)))
+
+@functools.lru_cache(maxsize=None)
+def _cell_sprite(text, font):
+    """
+    Render the contents of one cell once, as a transparent sprite to paste into grids.
 
-    # Draw the grid borders
-    for row in range(4):  # Draw horizontal lines, including bottom border
-        y = row * cell_size
-        draw.line([(0, y), (grid_size, y)], fill=border_color, width=border_width)
-    for col in range(4):  # Draw vertical lines, including right-most border
-        x = col * cell_size
-        draw.line([(x, 0), (x, grid_size)], fill=border_color, width=border_width)
+    :param text: The cell string, '*' for a star, 'x' for a cross, otherwise text
+    :param font: Font for text cells
+    :return: An RGBA image the size of a cell, or None if the cell draws nothing
+    """
+    sprite = Image.new("RGBA", (CELL_SIZE, CELL_SIZE), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+
+    if text == '*':
+        # Draw a fancy shooting star shape
+        draw.polygon(STAR_TEMPLATE, fill=STAR_COLOR)
+    elif text == 'x':
+        # Draw a cross
+        cross_size = CELL_SIZE // 4
+        draw.line(
+            [(CELL_SIZE // 2 - cross_size, CELL_SIZE // 2 - cross_size),
+             (CELL_SIZE // 2 + cross_size, CELL_SIZE // 2 + cross_size)],
+            fill=CROSS_COLOR, width=BORDER_WIDTH)
+        draw.line(
+            [(CELL_SIZE // 2 + cross_size, CELL_SIZE // 2 - cross_size),
+             (CELL_SIZE // 2 - cross_size, CELL_SIZE // 2 + cross_size)],
+            fill=CROSS_COLOR, width=BORDER_WIDTH)
+    else:
+        text_bbox = font.getbbox(text)  # Use getbbox() to calculate text dimensions
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+        # Center the text in the cell
+        text_x = (CELL_SIZE - text_width) // 2
+        text_y = (CELL_SIZE - text_height) // 2
+        draw.text((text_x, text_y), text, fill=TEXT_COLOR, font=font)
+
+    # Empty cells, like " ", have nothing to paste
+    if sprite.getbbox() is None:
+        return None
+    return sprite
+
+def draw_cell_into(image, draw, ox, oy, data, digit, font, digit_font):
+    """
+    Draw one clue's cells and digit into its grid, with its top-left corner at (ox, oy).
+
+    :param image: The image from new_clues_image
+    :param draw: ImageDraw bound to that image
+    :param ox: Left edge of the clue in that image
+    :param oy: Top edge of the clue in that image
+    :param data: List of the 9 cell strings
+    :param digit: The clue number shown in the top-left corner
+    :param font: Font for text cells
+    :param digit_font: Font for the clue number
+    """
+    # The grid sits inside the clue, offset by its margins
+    gx = ox + MARGIN * 3
+    gy = oy + MARGIN
 
-    # Draw the strings into the grid
+    # Paste the strings into the grid
     for index, text in enumerate(data):
-        x_offset = (index % 3) * cell_size
-        y_offset = (index // 3) * cell_size
-
-        if text == '*':
-            # Draw a fancy shooting star shape
-            star_points = [
-                (x_offset + cell_size // 2, y_offset + 10),
-                (x_offset + cell_size // 2 + 10, y_offset + cell_size // 2 - 10),
-                (x_offset + cell_size - 10, y_offset + cell_size // 2 - 10),
-                (x_offset + cell_size // 2 + 20, y_offset + cell_size // 2 + 10),
-                (x_offset + cell_size // 2 + 30, y_offset + cell_size - 10),
-                (x_offset + cell_size // 2, y_offset + cell_size // 2 + 20),
-                (x_offset + cell_size // 2 - 30, y_offset + cell_size - 10),
-                (x_offset + cell_size // 2 - 20, y_offset + cell_size // 2 + 10),
-                (x_offset + 10, y_offset + cell_size // 2 - 10),
-                (x_offset + cell_size // 2 - 10, y_offset + cell_size // 2 - 10),
-            ]
-            draw.polygon(star_points, fill=star_color)
-        elif text == 'x':
-            # Draw a cross
-            cross_size = cell_size // 4
-            draw.line(
-                [(x_offset + cell_size // 2 - cross_size, y_offset + cell_size // 2 - cross_size),
-                 (x_offset + cell_size // 2 + cross_size, y_offset + cell_size // 2 + cross_size)],
-                fill=cross_color, width=border_width)
-            draw.line(
-                [(x_offset + cell_size // 2 + cross_size, y_offset + cell_size // 2 - cross_size),
-                 (x_offset + cell_size // 2 - cross_size, y_offset + cell_size // 2 + cross_size)],
-                fill=cross_color, width=border_width)
-        else:
-            text_bbox = font.getbbox(text)  # Use getbbox() to calculate text dimensions
-            text_width = text_bbox[2] - text_bbox[0]
-            text_height = text_bbox[3] - text_bbox[1]
-            # Center the text in the cell
-            text_x = x_offset + (cell_size - text_width) // 2
-            text_y = y_offset + (cell_size - text_height) // 2
-            draw.text((text_x, text_y), text, fill=text_color, font=font)
-
-    # Paste the grid image onto the canvas with margins
-    canvas_image.paste(grid_image, (margin*3, margin))
-
-    # Add a digit "digit" in the top-left corner of the canvas
-    digit_font_size = 60
-    try:
-        digit_font = ImageFont.truetype("calibri.ttf", size=digit_font_size)
-    except IOError:
-        digit_font = ImageFont.load_default()
-    draw_canvas = ImageDraw.Draw(canvas_image)
-    draw_canvas.text((margin // 2, margin // 2), str(digit), fill=text_color, font=digit_font)
+        sprite = _cell_sprite(text, font)
+        if sprite is not None:
+            image.paste(sprite, (gx + (index % 3) * CELL_SIZE, gy + (index // 3) * CELL_SIZE), sprite)
 
-    return canvas_image
+    # Add a digit "digit" in the top-left corner of the clue
+    draw.text((ox + MARGIN // 2, oy + MARGIN // 2), str(digit), fill=TEXT_COLOR, font=digit_font)
 
-def generate_picture(clues):
-    images = []
+def save_png(image, filepath):
+    """
+    Save an RGB image as PNG, using OpenCV's faster RLE encoder when available.
+
+    :param image: The PIL image to save
+    :param filepath: Where to write the PNG
+    """
+    if cv2 is None:
+        # Encode in memory and write the file in one go rather than many small writes
+        buf = io.BytesIO()
+        image.save(buf, format='PNG', optimize=False, compress_level=1)
+        with open(filepath, 'wb') as f:
+            f.write(buf.getbuffer())
+        return
+    # cv2.imwrite reports failure by returning False rather than raising
+    if not cv2.imwrite(filepath, cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR),
+                       [cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE,
+                        cv2.IMWRITE_PNG_COMPRESSION, 1]):
+        raise OSError(f"Could not write image to {filepath}")
+
+def generate_picture(clues, show=False, output_path="clues.png"):
+    # Optional: Load fonts (use TTF fonts if available)
+    font = _get_font("arial.ttf", 30)
+    digit_font = _get_font("calibri.ttf", DIGIT_FONT_SIZE)
+
+    # Draw all clues straight into one 3x3 grid image
+    grid_image = new_clues_image(3, 3)
+    draw = ImageDraw.Draw(grid_image)
     for key in range(1, 10):
         assert key in clues
-        # Create an image from the array
-        image = convert_list_to_image(clues[key], key)
-        images.append(image)
-
-    # Assume all images have the same size
-    img_width, img_height = images[0].size
-
-    # Create a blank image for the 3x3 grid
-    grid_width = img_width * 3
-    grid_height = img_height * 3
-    grid_image = Image.new("RGB", (grid_width, grid_height))
-
-    # Paste images into the grid
-    for index, img in enumerate(images):
-        x_offset = (index % 3) * img_width
-        y_offset = (index // 3) * img_height
-        grid_image.paste(img, (x_offset, y_offset))
-
-    # Save or display the image
-    grid_image.save("clues.png")
-    grid_image.show()
-
-clues, answer = generate_clues_and_answer()
-generate_picture(clues)
-#render_result(clues, answer)
+        x_offset = ((key - 1) % 3) * TILE_SIZE
+        y_offset = ((key - 1) // 3) * TILE_SIZE
+        draw_cell_into(grid_image, draw, x_offset, y_offset, clues[key], key, font, digit_font)
+
+    # Save and optionally display the image
+    save_png(grid_image, output_path)
+    if show:
+        grid_image.show()
+
+def _run_once(output_path, show=False, verbose=True):
+    """
+    Generate one puzzle and save its clues image, reseeding from OS entropy so parallel runs differ.
+
+    :param output_path: Where to save the clues image
+    :param show: Whether to open the image in the default viewer
+    :param verbose: Whether to print the clues and the answer
+    :return: The clues and the answer
+    """
+    random.seed()
+    clues, answer = generate_clues_and_answer(verbose=verbose)
+    generate_picture(clues, show=show, output_path=output_path)
+    #render_result(clues, answer)
+    return clues, answer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a 3x3 grid puzzle with clues and an answer.')
+    parser.add_argument('--show', action='store_true', help='Open the generated image in the default viewer')
+    parser.add_argument('--count', type=int, default=1,
+                        help='Number of puzzles to generate, saved as clues_<n>.png when more than 1 (default: 1)')
+    args = parser.parse_args()
+
+    if args.count <= 1:
+        _run_once("clues.png", show=args.show)
+    else:
+        output_paths = [f"clues_{n}.png" for n in range(1, args.count + 1)]
+        with ProcessPoolExecutor(max_workers=min(args.count, os.cpu_count() or 1)) as executor:
+            results = executor.map(functools.partial(_run_once, show=args.show, verbose=False),
+                                   output_paths)
+            # Print from here in file order, since workers would interleave their output
+            for output_path, (clues, answer) in zip(output_paths, results):
+                print(f"{output_path}:")
+                print_clues_and_answer(clues, answer)